@@ -1,15 +1,48 @@
 """Authentication with JWT and password hashing."""
-from datetime import datetime, timedelta
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
+import bcrypt
 from fastapi import HTTPException
-from jose import JWTError, jwt  # type: ignore[import-untyped]
-from passlib.context import CryptContext  # type: ignore[import-untyped]
+import jwt
+from jwt import InvalidTokenError
+
+from app.config import BCRYPT_ROUNDS, SAGE_HASH_CACHE
 
 SECRET_KEY = "sage-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 7
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_DAYS * 86400
+
+# Decoded tokens (raw token -> (username, exp)), so repeat requests skip
+# base64/JSON/HMAC. Call clear_token_cache() after rotating SECRET_KEY,
+# otherwise tokens signed with the old key stay valid until they expire.
+TOKEN_CACHE_SIZE = 4096
+_token_cache: "OrderedDict[str, tuple[str, int]]" = OrderedDict()
+
+# Opt-in (SAGE_HASH_CACHE): keyed BLAKE2b digest of a password -> its bcrypt hash
+HASH_CACHE_SIZE = 1024
+_hash_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_hash_cache_lock = threading.Lock()
+
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _hash_cached(password: bytes) -> str:
+    """Return a cached bcrypt hash for password, hashing it on a miss."""
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), password, hashlib.blake2b).digest()
+    with _hash_cache_lock:
+        hashed = _hash_cache.get(digest)
+        if hashed is not None:
+            _hash_cache.move_to_end(digest)
+            return hashed
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+    with _hash_cache_lock:
+        _hash_cache[digest] = hashed
+        if len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+    return hashed
 
 
 def hash_password(password: str) -> str:
@@ -19,26 +52,49 @@ def hash_password(password: str) -> str:
     if len(password.encode("utf-8")) > 72:
         raise HTTPException(status_code=400, detail="Password too long")
 
-    return pwd_context.hash(password)
+    if SAGE_HASH_CACHE:
+        return _hash_cached(password.encode("utf-8"))
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
 
 
 
 def verify_password(plain: str, hashed: str) -> bool:
     """Verify password against hash."""
-    return pwd_context.verify(plain, hashed)
+    try:
+        return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError:
+        return False
 
 
 def create_token(username: str) -> str:
     """Create JWT access token."""
-    expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-    payload = {"sub": username, "exp": expire}
+    payload = {"sub": username, "exp": int(time.time()) + ACCESS_TOKEN_EXPIRE_SECONDS}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def clear_token_cache() -> None:
+    """Forget all cached token decodes."""
+    _token_cache.clear()
+
+
 def decode_token(token: str) -> Optional[str]:
     """Decode JWT and return username."""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        username, exp = cached
+        if exp > time.time():
+            _token_cache.move_to_end(token)
+            return username
+        _token_cache.pop(token, None)
+        return None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
-    except JWTError:
+    except InvalidTokenError:
         return None
+    sub = payload.get("sub")
+    exp_claim = payload.get("exp")
+    if isinstance(sub, str) and isinstance(exp_claim, int):
+        _token_cache[token] = (sub, exp_claim)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return sub
@@ -1,8 +1,30 @@
 """Chat service with AI and fallback responses for mental health support."""
+import asyncio
+import importlib.util
 import random
 import re
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+import ahocorasick  # type: ignore[import-not-found]
+import httpx
+import orjson
+
 from app.config import OPENAI_API_KEY, GROQ_API_KEY
 
+if TYPE_CHECKING:
+    from app.keyword_scan import KeywordScanner
+
+# Shared HTTP client so LLM calls reuse pooled keep-alive connections
+_CLIENT: httpx.AsyncClient | None = None
+
+# Private RNG for fallback response variety
+_RNG = random.Random()
+
+# Seconds each provider gets before its answer is abandoned
+PROVIDER_TIMEOUT = 8.0
+
 # System prompt for any AI provider
 SAGE_SYSTEM_PROMPT = (
     "You are Sage, a compassionate AI assistant that helps users cope with "
@@ -16,7 +38,7 @@ SAGE_SYSTEM_PROMPT = (
 
 # Empathetic fallback responses (used when no API key is set)
 EMPATHETIC_RESPONSES = {
-    "depression": [
+    "depression": (
         "I hear you, and what you're feeling is valid. Depression can make everything feel heavy. "
         "Remember, you don't have to face this alone. Have you considered reaching out to a trusted friend or professional?",
         "That sounds really difficult. It takes courage to open up about what you're going through. "
@@ -27,8 +49,8 @@ EMPATHETIC_RESPONSES = {
         "Sometimes the bravest thing is to ask for help. Would you feel able to reach out to someone today?",
         "I'm glad you're here. It's okay to not be okay. "
         "Many people find that small routines—getting outside, a short walk, or a phone call—can help a little. What feels possible for you right now?",
-    ],
-    "anxiety": [
+    ),
+    "anxiety": (
         "I understand how overwhelming anxiety can feel. Your feelings are valid. "
         "Have you tried grounding techniques like the 5-4-3-2-1 method? Notice 5 things you see, 4 you hear, 3 you touch, 2 you smell, 1 you taste.",
         "Anxiety can make everything feel urgent. Remember to breathe—slow, deep breaths can help calm your nervous system. "
@@ -37,8 +59,8 @@ EMPATHETIC_RESPONSES = {
         "Would it help to focus on something simple right now, like your breathing?",
         "I hear you. When anxiety spikes, it can feel like too much. "
         "Try naming what you see around you or feeling your feet on the ground. You're safe in this moment.",
-    ],
-    "stress": [
+    ),
+    "stress": (
         "Stress can feel overwhelming when it builds up. It's important to take breaks when you can. "
         "Going for a short walk, listening to music, or doing something you enjoy can help reset your mind.",
         "You're carrying a lot right now. Remember that it's okay to ask for help or say no to things that feel like too much. "
@@ -47,8 +69,8 @@ EMPATHETIC_RESPONSES = {
         "Even 5 minutes of quiet can make a difference.",
         "It sounds like a lot is on your plate. You don't have to do everything at once. "
         "What's one thing you could set aside or delegate, even just for today?",
-    ],
-    "loneliness": [
+    ),
+    "loneliness": (
         "Feeling lonely is difficult, and it's more common than many people realize. "
         "Even small connections—a text, a call, or joining an online community—can help.",
         "Loneliness can make us feel invisible. But you matter. "
@@ -57,20 +79,20 @@ EMPATHETIC_RESPONSES = {
         "Support groups, hobby clubs, or volunteering can be ways to build meaningful connections.",
         "Connection doesn't have to be big. A short message, a wave to a neighbour, or a walk in a park can remind us we're part of the world. "
         "Is there one person or place you could reach out to this week?",
-    ],
-    "sleep": [
+    ),
+    "sleep": (
         "Sleep and mood are closely linked. Struggling to sleep can make everything feel harder. "
         "A consistent bedtime, limiting screens before bed, and a calm routine can help. If it persists, a doctor can help rule out sleep issues.",
         "Not sleeping well is exhausting and can affect how you feel during the day. "
         "Try to keep a regular schedule and avoid caffeine late in the day. You're not alone in this.",
-    ],
-    "anger": [
+    ),
+    "anger": (
         "Anger can be a way our mind and body respond to stress or hurt. It's valid to feel it. "
         "Taking a pause, stepping away, or writing it out can sometimes help before we respond.",
         "Feeling angry doesn't make you a bad person. It often means something matters to you or something feels unfair. "
         "If you can, give yourself a moment before reacting. You deserve that space.",
-    ],
-    "general": [
+    ),
+    "general": (
         "I'm here to listen. Whatever you're going through, your feelings matter. "
         "Would you like to tell me more about what's on your mind?",
         "Thank you for reaching out. It takes strength to acknowledge when you're struggling. "
@@ -81,11 +103,11 @@ EMPATHETIC_RESPONSES = {
         "What would feel helpful to talk about right now?",
         "Whatever you're feeling, it's okay to feel it. "
         "Take your time. I'm here when you want to share more.",
-    ],
+    ),
 }
 
 # Crisis keywords - always include helpline info
-CRISIS_KEYWORDS = ["suicide", "suicidal", "kill myself", "end my life", "want to die", "self-harm", "hurt myself"]
+CRISIS_KEYWORDS = ("suicide", "suicidal", "kill myself", "end my life", "want to die", "self-harm", "hurt myself")
 
 # India mental health helplines (24/7, toll-free)
 CRISIS_MESSAGE = (
@@ -97,30 +119,71 @@ CRISIS_MESSAGE = (
     "Vandrevala Foundation: 1860-2662-345 / 1800-2333-330"
 )
 
+# Sentence terminators for picking the first sentence of a message
+_SENT_SPLIT = re.compile(r"[.!?]")
+
 # Reflection prefixes to make fallback feel more personal
-REFLECTION_PREFIXES = [
+REFLECTION_PREFIXES = (
     "You shared that {} — ",
     "It sounds like {} — ",
     "Hearing that {} — ",
-]
-
-
-def _detect_topic(message: str) -> str:
-    """Detect the primary topic from user message."""
-    msg_lower = message.lower()
-    if any(kw in msg_lower for kw in ["depress", "sad", "hopeless", "empty", "worthless", "down", "low"]):
-        return "depression"
-    if any(kw in msg_lower for kw in ["anxious", "anxiety", "panic", "worry", "worried", "nervous", "scared"]):
-        return "anxiety"
-    if any(kw in msg_lower for kw in ["stress", "stressed", "overwhelm", "pressure", "busy", "tired"]):
-        return "stress"
-    if any(kw in msg_lower for kw in ["lonely", "alone", "isolat", "disconnect", "no one", "friend"]):
-        return "loneliness"
-    if any(kw in msg_lower for kw in ["sleep", "insomnia", "tired", "exhausted", "can't sleep"]):
-        return "sleep"
-    if any(kw in msg_lower for kw in ["angry", "anger", "frustrat", "irritat", "mad"]):
-        return "anger"
-    return "general"
+)
+
+# Follow-up suggestions offered with each fallback topic
+_SUGGESTIONS: dict[str, tuple[str, ...]] = {
+    "depression": ("Talk about what helps", "I want to try therapy", "Coping strategies"),
+    "anxiety": ("Breathing exercises", "Grounding techniques", "When to see a professional"),
+    "stress": ("Stress management tips", "Setting boundaries", "Self-care ideas"),
+    "loneliness": ("Building connections", "Online communities", "Volunteering"),
+    "sleep": ("Sleep routine tips", "When to see a doctor", "Relaxation before bed"),
+    "anger": ("Managing anger", "Safe ways to express", "When to get support"),
+    "general": ("Tell me more", "I need resources", "Crisis support"),
+}
+
+# Topic keywords; the topic with the most keyword hits wins, ties go to the earlier topic.
+# A keyword must not contain another keyword of the same topic, or it is counted twice.
+TOPIC_KEYWORDS = {
+    "depression": ("depress", "sad", "hopeless", "empty", "worthless", "down", "low"),
+    "anxiety": ("anxious", "anxiety", "panic", "worry", "worried", "nervous", "scared"),
+    "stress": ("stress", "overwhelm", "pressure", "busy", "tired"),
+    "loneliness": ("lonely", "alone", "isolat", "disconnect", "no one", "friend"),
+    "sleep": ("sleep", "insomnia", "tired", "exhausted"),
+    "anger": ("angry", "anger", "frustrat", "irritat", "mad"),
+}
+
+
+def _build_keyword_table() -> tuple[tuple[str, ...], tuple[tuple[tuple[str, float], ...], ...]]:
+    """Return (keywords, weights) where weights[i] holds (group, weight) pairs for keywords[i].
+
+    A keyword listed under several topics (e.g. "tired") splits its weight between them.
+    """
+    groups: dict[str, list[str]] = {}
+    for kw in CRISIS_KEYWORDS:
+        groups.setdefault(kw, []).append("crisis")
+    for topic, keywords in TOPIC_KEYWORDS.items():
+        for kw in keywords:
+            groups.setdefault(kw, []).append(topic)
+    weights = tuple(tuple((g, 1.0 / len(kw_groups)) for g in kw_groups) for kw_groups in groups.values())
+    return tuple(groups), weights
+
+
+_KEYWORDS, _KEYWORD_WEIGHTS = _build_keyword_table()
+
+
+def _build_automaton() -> ahocorasick.Automaton:
+    """Build one Aho-Corasick automaton over crisis and topic keywords."""
+    automaton = ahocorasick.Automaton()
+    for kid, kw in enumerate(_KEYWORDS):
+        automaton.add_word(kw, kid)
+    automaton.make_automaton()
+    return automaton
+
+
+# Every keyword maps to its index in _KEYWORDS
+AUTOMATON = _build_automaton()
+
+# Numba scanner for classify_transcript; built on first use, never on the chat path
+_TRANSCRIPT_SCANNER: "KeywordScanner | None" = None
 
 
 def _short_reflection(message: str, max_words: int = 8) -> str | None:
@@ -129,17 +192,66 @@ def _short_reflection(message: str, max_words: int = 8) -> str | None:
     if len(message) < 10:
         return None
     # Take first sentence or first max_words words
-    first = re.split(r"[.!?]", message)[0].strip()
+    first = _SENT_SPLIT.split(message, maxsplit=1)[0].strip()
     words = first.split()[:max_words]
     if len(words) < 2:
         return None
     return " ".join(words).lower()
 
 
-def _is_crisis(message: str) -> bool:
-    """Check if message contains crisis-related content."""
-    msg_lower = message.lower()
-    return any(kw in msg_lower for kw in CRISIS_KEYWORDS)
+def _score(hits: Iterable[tuple[int, int]]) -> tuple[bool, str]:
+    """Turn (keyword index, occurrences) hits into (is_crisis, topic)."""
+    scores: dict[str, float] = defaultdict(float)
+    for kid, count in hits:
+        for group, weight in _KEYWORD_WEIGHTS[kid]:
+            if group == "crisis":
+                return True, "general"
+            scores[group] += weight * count
+    if not scores:
+        return False, "general"
+    return False, max(TOPIC_KEYWORDS, key=lambda t: scores.get(t, 0.0))
+
+
+def _classify(message: str) -> tuple[bool, str]:
+    """Scan the message once; return (is_crisis, topic)."""
+    return _score((kid, 1) for _, kid in AUTOMATON.iter(message.lower()))
+
+
+def classify_transcript(messages: list[str]) -> tuple[bool, str]:
+    """Classify a whole conversation for offline analytics; return (is_crisis, topic).
+
+    Uses the Numba scanner when numba is installed. Its first call compiles the
+    kernel, so never call this from a request handler.
+    """
+    global _TRANSCRIPT_SCANNER
+    text = "\n".join(messages).lower()
+    if _TRANSCRIPT_SCANNER is None and importlib.util.find_spec("numba"):
+        from app.keyword_scan import KeywordScanner
+
+        _TRANSCRIPT_SCANNER = KeywordScanner(_KEYWORDS)
+    if _TRANSCRIPT_SCANNER is None:
+        return _score((kid, 1) for _, kid in AUTOMATON.iter(text))
+    counts = _TRANSCRIPT_SCANNER.count(text)
+    return _score((int(kid), int(counts[kid])) for kid in counts.nonzero()[0])
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20),
+        )
+    return _CLIENT
+
+
+async def close_client() -> None:
+    """Close the shared HTTP client (on app shutdown)."""
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
 
 
 async def _openai_response(message: str) -> str | None:
@@ -147,27 +259,26 @@ async def _openai_response(message: str) -> str | None:
     if not OPENAI_API_KEY:
         return None
     try:
-        import httpx  # type: ignore[import-untyped]
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "gpt-3.5-turbo",
-                    "messages": [
-                        {"role": "system", "content": SAGE_SYSTEM_PROMPT},
-                        {"role": "user", "content": message},
-                    ],
-                    "max_tokens": 400,
-                    "temperature": 0.7,
-                },
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return data["choices"][0]["message"]["content"].strip()
+        client = _get_client()
+        response = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {OPENAI_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            content=orjson.dumps({
+                "model": "gpt-3.5-turbo",
+                "messages": [
+                    {"role": "system", "content": SAGE_SYSTEM_PROMPT},
+                    {"role": "user", "content": message},
+                ],
+                "max_tokens": 400,
+                "temperature": 0.7,
+            }),
+        )
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            return data["choices"][0]["message"]["content"].strip()
     except Exception:
         pass
     return None
@@ -178,68 +289,75 @@ async def _groq_response(message: str) -> str | None:
     if not GROQ_API_KEY:
         return None
     try:
-        import httpx  # type: ignore[import-untyped]
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "llama-3.1-8b-instant",
-                    "messages": [
-                        {"role": "system", "content": SAGE_SYSTEM_PROMPT},
-                        {"role": "user", "content": message},
-                    ],
-                    "max_tokens": 400,
-                    "temperature": 0.7,
-                },
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return data["choices"][0]["message"]["content"].strip()
+        client = _get_client()
+        response = await client.post(
+            "https://api.groq.com/openai/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {GROQ_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            content=orjson.dumps({
+                "model": "llama-3.1-8b-instant",
+                "messages": [
+                    {"role": "system", "content": SAGE_SYSTEM_PROMPT},
+                    {"role": "user", "content": message},
+                ],
+                "max_tokens": 400,
+                "temperature": 0.7,
+            }),
+        )
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            return data["choices"][0]["message"]["content"].strip()
     except Exception:
         pass
     return None
 
 
 async def get_ai_response(message: str) -> str | None:
-    """Try OpenAI first, then Groq. Returns None if no key or on error."""
-    result = await _openai_response(message)
-    if result:
-        return result
-    return await _groq_response(message)
+    """Query OpenAI and Groq concurrently; first reply wins. Returns None if no key or on error."""
+    providers = []
+    if OPENAI_API_KEY:
+        providers.append(_openai_response)
+    if GROQ_API_KEY:
+        providers.append(_groq_response)
+    tasks = [
+        asyncio.create_task(asyncio.wait_for(provider(message), PROVIDER_TIMEOUT))
+        for provider in providers
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                result = await next_done
+            except asyncio.TimeoutError:
+                continue
+            if result:
+                return result
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
-def _fallback_response(message: str) -> tuple[str, list[str]]:
+def _fallback_response(message: str, topic: str) -> tuple[str, list[str]]:
     """Build a rich fallback response when no API key is available."""
-    topic = _detect_topic(message)
     responses = EMPATHETIC_RESPONSES.get(topic, EMPATHETIC_RESPONSES["general"])
-    base = random.choice(responses)
+    base = _RNG.choice(responses)
     reflection = _short_reflection(message)
-    if reflection and random.random() < 0.5:
-        prefix = random.choice(REFLECTION_PREFIXES).format(reflection)
+    if reflection and _RNG.random() < 0.5:
+        prefix = _RNG.choice(REFLECTION_PREFIXES).format(reflection)
         response = prefix + base
     else:
         response = base
 
-    suggestions_map = {
-        "depression": ["Talk about what helps", "I want to try therapy", "Coping strategies"],
-        "anxiety": ["Breathing exercises", "Grounding techniques", "When to see a professional"],
-        "stress": ["Stress management tips", "Setting boundaries", "Self-care ideas"],
-        "loneliness": ["Building connections", "Online communities", "Volunteering"],
-        "sleep": ["Sleep routine tips", "When to see a doctor", "Relaxation before bed"],
-        "anger": ["Managing anger", "Safe ways to express", "When to get support"],
-        "general": ["Tell me more", "I need resources", "Crisis support"],
-    }
-    suggestions = suggestions_map.get(topic, suggestions_map["general"])
-    return response, suggestions
+    suggestions = _SUGGESTIONS.get(topic, _SUGGESTIONS["general"])
+    return response, list(suggestions)
 
 
 async def get_chat_response(message: str) -> tuple[str, list[str]]:
     """Get response for user message. Returns (response_text, suggestions)."""
-    if _is_crisis(message):
+    is_crisis, topic = _classify(message)
+    if is_crisis:
         return CRISIS_MESSAGE, ["Call Tele-MANAS 14416", "Call KIRAN 1800-599-0019", "Reach out to someone you trust"]
 
     ai_response = await get_ai_response(message)
@@ -247,4 +365,4 @@ async def get_chat_response(message: str) -> tuple[str, list[str]]:
         suggestions = ["Tell me more", "What coping strategies help?", "I need professional help"]
         return ai_response, suggestions
 
-    return _fallback_response(message)
+    return _fallback_response(message, topic)
@@ -9,3 +9,12 @@ if importlib.util.find_spec("dotenv"):
 # Get free keys: OpenAI (platform.openai.com), Groq (console.groq.com - free tier)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+
+# bcrypt cost factor. Raise it on faster hardware; existing hashes keep their own cost.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+if not 4 <= BCRYPT_ROUNDS <= 31:
+    raise ValueError(f"BCRYPT_ROUNDS must be between 4 and 31, got {BCRYPT_ROUNDS}")
+
+# Reuse bcrypt hashes for repeated passwords (bulk imports / load tests only).
+# Off by default: users sharing a password would also share a salt.
+SAGE_HASH_CACHE = os.getenv("SAGE_HASH_CACHE", "").lower() in ("1", "true", "yes")
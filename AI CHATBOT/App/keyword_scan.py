@@ -0,0 +1,84 @@
+"""Numba-compiled Aho-Corasick keyword scanner for long texts (requires numba)."""
+from collections import deque
+
+import numpy as np
+from numba import njit
+
+
+def _build_tables(keywords: tuple[str, ...]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Build byte-level goto/fail tables plus per-state outputs (CSR: out_ptr, out_ids)."""
+    goto = [[-1] * 256]
+    fail = [0]
+    out: list[list[int]] = [[]]
+    for kid, kw in enumerate(keywords):
+        state = 0
+        for b in kw.encode("utf-8"):
+            if goto[state][b] == -1:
+                goto[state][b] = len(goto)
+                goto.append([-1] * 256)
+                fail.append(0)
+                out.append([])
+            state = goto[state][b]
+        out[state].append(kid)
+
+    queue: deque[int] = deque()
+    for b in range(256):
+        if goto[0][b] == -1:
+            goto[0][b] = 0
+        else:
+            queue.append(goto[0][b])
+    while queue:
+        r = queue.popleft()
+        for b in range(256):
+            s = goto[r][b]
+            if s == -1:
+                continue
+            queue.append(s)
+            f = fail[r]
+            while goto[f][b] == -1:
+                f = fail[f]
+            fail[s] = goto[f][b]
+            out[s].extend(out[fail[s]])
+
+    out_ptr = np.zeros(len(out) + 1, dtype=np.int32)
+    for i, ids in enumerate(out):
+        out_ptr[i + 1] = out_ptr[i] + len(ids)
+    out_ids = np.array([kid for ids in out for kid in ids], dtype=np.int32)
+    return (
+        np.array(goto, dtype=np.int32),
+        np.array(fail, dtype=np.int32),
+        out_ptr,
+        out_ids,
+    )
+
+
+@njit(cache=True)
+def scan(text: np.ndarray, goto: np.ndarray, fail: np.ndarray,
+         out_ptr: np.ndarray, out_ids: np.ndarray, counts: np.ndarray) -> int:
+    """Add keyword occurrences in text (uint8 bytes) to counts; return total matches."""
+    state = 0
+    total = 0
+    for i in range(text.shape[0]):
+        c = text[i]
+        while goto[state, c] == -1:
+            state = fail[state]
+        state = goto[state, c]
+        for j in range(out_ptr[state], out_ptr[state + 1]):
+            counts[out_ids[j]] += 1
+            total += 1
+    return total
+
+
+class KeywordScanner:
+    """Counts keyword occurrences with the compiled scan kernel."""
+
+    def __init__(self, keywords: tuple[str, ...]):
+        self.n_keywords = len(keywords)
+        self.goto, self.fail, self.out_ptr, self.out_ids = _build_tables(keywords)
+
+    def count(self, text: str) -> np.ndarray:
+        """Return per-keyword occurrence counts for already-lowercased text."""
+        data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+        counts = np.zeros(self.n_keywords, dtype=np.int64)
+        scan(data, self.goto, self.fail, self.out_ptr, self.out_ids, counts)
+        return counts
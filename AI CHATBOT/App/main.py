@@ -1,4 +1,5 @@
 """FastAPI application for Sage - AI Mental Health Support Chatbot."""
+import asyncio
 import sqlite3
 from pathlib import Path
 
@@ -10,7 +11,7 @@ from fastapi.staticfiles import StaticFiles  # type: ignore[import-untyped]
 from app.auth import create_token, decode_token, hash_password, verify_password
 from app.database import get_connection, init_db
 from app.models import ChatMessage, ChatResponse, UserLogin, UserRegister
-from app.chat_service import get_chat_response
+from app.chat_service import close_client, get_chat_response
 
 app = FastAPI(
     title="Sage",
@@ -50,6 +51,11 @@ def startup():
     init_db()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_client()
+
+
 # --- Auth routes ---
 
 @app.post("/api/register")
@@ -59,34 +65,29 @@ async def register(data: UserRegister):
     print("PASSWORD VALUE:", data.password)
 
     """Register a new user."""
-    conn = get_connection()
+    password_hash = await asyncio.to_thread(hash_password, data.password)
     try:
-        conn.execute(
-            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
-            (data.username.lower(), data.email.lower(), hash_password(data.password)),
-        )
-        conn.commit()
-        token = create_token(data.username.lower())
-        return {"access_token": token, "token_type": "bearer"}
+        with get_connection() as conn:
+            conn.execute(
+                "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                (data.username.lower(), data.email.lower(), password_hash),
+            )
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Username or email already exists")
-    finally:
-        conn.close()
+    token = create_token(data.username.lower())
+    return {"access_token": token, "token_type": "bearer"}
 
 
 @app.post("/api/login")
 async def login(data: UserLogin):
     """Login and return JWT."""
-    conn = get_connection()
-    try:
+    with get_connection() as conn:
         cur = conn.execute(
             "SELECT username, password_hash FROM users WHERE username = ?",
             (data.username.lower(),),
         )
         row = cur.fetchone()
-    finally:
-        conn.close()
-    if not row or not verify_password(data.password, row["password_hash"]):
+    if not row or not await asyncio.to_thread(verify_password, data.password, row["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid username or password")
     token = create_token(row["username"])
     return {"access_token": token, "token_type": "bearer"}
@@ -130,28 +131,23 @@ async def chat(message: ChatMessage, request: Request):
     response, suggestions = await get_chat_response(message.message)
 
     # Save to history
-    conn = get_connection()
-    try:
+    with get_connection() as conn:
         cur = conn.execute("SELECT id FROM users WHERE username = ?", (username,))
         user_row = cur.fetchone()
         if user_row:
             user_id = user_row["id"]
-            conn.execute(
+            cur = conn.execute(
                 "INSERT INTO chat_sessions (user_id) VALUES (?)",
                 (user_id,),
             )
-            session_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            conn.execute(
+            session_id = cur.lastrowid
+            conn.executemany(
                 "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
-                (session_id, "user", message.message),
+                [
+                    (session_id, "user", message.message),
+                    (session_id, "assistant", response),
+                ],
             )
-            conn.execute(
-                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
-                (session_id, "assistant", response),
-            )
-            conn.commit()
-    finally:
-        conn.close()
 
     return ChatResponse(response=response, suggestions=suggestions)
 
@@ -160,23 +156,21 @@ async def chat(message: ChatMessage, request: Request):
 async def get_history(request: Request):
     """Get user's chat history."""
     username = require_auth(request)
-    conn = get_connection()
-    try:
+    with get_connection() as conn:
         cur = conn.execute(
             """
-            SELECT s.id, s.created_at,
-                   (SELECT COUNT(*) FROM messages m WHERE m.session_id = s.id) as msg_count
+            SELECT s.id, s.created_at, COUNT(m.id) as msg_count
             FROM chat_sessions s
             JOIN users u ON s.user_id = u.id
+            LEFT JOIN messages m ON m.session_id = s.id
             WHERE u.username = ?
+            GROUP BY s.id
             ORDER BY s.created_at DESC
             LIMIT 50
             """,
             (username,),
         )
         sessions = [dict(zip(row.keys(), row)) for row in cur.fetchall()]
-    finally:
-        conn.close()
     return {"sessions": sessions}
 
 
@@ -184,8 +178,7 @@ async def get_history(request: Request):
 async def get_session_messages(session_id: int, request: Request):
     """Get messages for a session."""
     username = require_auth(request)
-    conn = get_connection()
-    try:
+    with get_connection() as conn:
         cur = conn.execute(
             """
             SELECT m.role, m.content, m.created_at
@@ -198,8 +191,6 @@ async def get_session_messages(session_id: int, request: Request):
             (session_id, username),
         )
         rows = cur.fetchall()
-    finally:
-        conn.close()
     if not rows:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"messages": [dict(zip(r.keys(), r)) for r in rows]}
@@ -0,0 +1,73 @@
+"""Parity between the Numba keyword scanner and the pyahocorasick automaton."""
+import random
+
+import pytest
+
+pytest.importorskip("numba")
+ahocorasick = pytest.importorskip("ahocorasick")
+
+from app.chat_service import AUTOMATON, _KEYWORDS  # noqa: E402
+from app.keyword_scan import KeywordScanner  # noqa: E402
+
+# Keywords that end inside one another, so matches must follow fail links
+NESTED_KEYWORDS = ("he", "she", "his", "hers", "stress", "stressed", "distress", "sleep", "can't sleep")
+
+SAMPLES = [
+    "",
+    "hello there",
+    # overlapping keywords
+    "i am lonely and alone, no one is around",
+    "angry anger frustrated irritated mad",
+    "distressed, stressed and depressed",
+    "worried, worry, i want to die, kill myself",
+    "ushers said she can't sleep",
+    # non-ascii text around and between keywords
+    "i’m sad — très déprimé 😴 but tired, can’t sleep",
+    "ünïcödé lonely 日本語 anxious ✨ panic",
+    # repeated hits
+    "sad sad sad sad",
+    "lowlowlow downdown",
+    "tired tired tired",
+]
+
+
+def _build_automaton(keywords: tuple[str, ...]):
+    automaton = ahocorasick.Automaton()
+    for kid, kw in enumerate(keywords):
+        automaton.add_word(kw, kid)
+    automaton.make_automaton()
+    return automaton
+
+
+def _automaton_counts(automaton, n_keywords: int, text: str) -> list[int]:
+    counts = [0] * n_keywords
+    for _, kid in automaton.iter(text):
+        counts[kid] += 1
+    return counts
+
+
+CASES = [
+    ("chat", _KEYWORDS, AUTOMATON),
+    ("nested", NESTED_KEYWORDS, _build_automaton(NESTED_KEYWORDS)),
+]
+
+
+@pytest.fixture(scope="module", params=CASES, ids=[c[0] for c in CASES])
+def case(request):
+    _, keywords, automaton = request.param
+    return keywords, automaton, KeywordScanner(keywords)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_counts_match_automaton(case, text):
+    keywords, automaton, scanner = case
+    assert list(scanner.count(text)) == _automaton_counts(automaton, len(keywords), text)
+
+
+def test_counts_match_automaton_on_random_text(case):
+    keywords, automaton, scanner = case
+    rng = random.Random(0)
+    pieces = list(keywords) + ["x", " ", "é", "😴", "slee", "ang", "lo", "wlow", "di", "s"]
+    for _ in range(200):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 80)))
+        assert list(scanner.count(text)) == _automaton_counts(automaton, len(keywords), text), text